@@ -1,22 +1,17 @@
 
 import streamlit as st
-import google.generativeai as genai
-import webbrowser
 import re
 import json
+import copy
+import html
+import time
 
-# ==============================
-# CONFIG
-# ==============================
-st.set_page_config(page_title="Physiotherapist Chatbot", page_icon="💬", layout="centered")
-
-GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]   # <-- replace with your key
-genai.configure(api_key=GOOGLE_API_KEY)
+from chat_utils import normalize_pain_area, classify_mode
 
 # ==============================
-# STATE INIT
+# STATE DEFAULTS
 # ==============================
-defaults = {
+DEFAULTS = {
     "messages": [{"role": "bot", "content": "Hi there! What pain are you facing today?"}],
     "step": 1,
     "pain_area": "",          # "lower back", "upper back", "shoulder", ...
@@ -30,13 +25,37 @@ defaults = {
     "exercise_name": "",
     "reasoning": "",
 }
-for k, v in defaults.items():
-    st.session_state.setdefault(k, v)
+
+# ==============================
+# CONFIG
+# ==============================
+st.set_page_config(page_title="Physiotherapist Chatbot", page_icon="💬", layout="centered")
+
+# Streamlit reruns the script on every interaction, so the SDK import,
+# secrets lookup, configuration and model construction are done once per
+# process -- and only when a Gemini call is actually needed.
+@st.cache_resource
+def _genai():
+    import google.generativeai as genai
+    genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])   # <-- replace with your key
+    return genai
+
+@st.cache_resource
+def get_gemini_model(name: str = "gemini-1.5-flash"):
+    return _genai().GenerativeModel(name)
+
+# ==============================
+# STATE INIT
+# ==============================
+# One sentinel check per rerun instead of a setdefault per key.
+if "_init" not in st.session_state:
+    st.session_state.update(copy.deepcopy(DEFAULTS))
+    st.session_state._init = True
 
 # ==============================
 # STYLE (high-contrast for dark & light)
 # ==============================
-st.markdown("""
+CHAT_CSS = """
 <style>
 .chat-bubble { border-radius: 14px; padding: 10px 14px; margin: 6px 0; max-width: 80%; line-height: 1.45; }
 .user { background: #2563eb; color: #ffffff; margin-left: auto; }
@@ -47,15 +66,20 @@ st.markdown("""
 }
 .chat-container { display: flex; flex-direction: column; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Elements not emitted on a rerun are removed from the page, so the style
+# block has to be sent every run; it is minified once per process instead.
+@st.cache_resource
+def _chat_css() -> str:
+    return re.sub(r"\s*([{};:,])\s*", r"\1", " ".join(CHAT_CSS.split()))
+
+st.markdown(_chat_css(), unsafe_allow_html=True)
 
 # ==============================
 # HELPERS
 # ==============================
-KNOWN_AREAS = [
-    "lower back","low back","upper back","back","shoulder","knee","neck","hip","ankle",
-    "elbow","wrist","hamstring","quad","calf","glute","groin"
-]
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
 
 def header_pain_text(pain_raw: str) -> str:
     if not pain_raw:
@@ -65,40 +89,73 @@ def header_pain_text(pain_raw: str) -> str:
         p += " pain"
     return p[0].upper() + p[1:]
 
-def normalize_pain_area(text: str) -> str:
-    t = (text or "").lower()
-    if any(x in t for x in ["lower back","low back","lower-back"]):
-        return "lower back"
-    if "upper back" in t or "upper-back" in t:
-        return "upper back"
-    if "back" in t:
-        return "back"  # generic; we will ask upper/lower
-    for area in KNOWN_AREAS:
-        if area in t:
-            return area
-    m = re.search(r"(lower back|upper back|back|shoulder|knee|neck|hip|ankle|elbow|wrist|hamstring|quad|calf|glute|groin)", t)
-    return m.group(1) if m else ""
-
-def classify_mode(history_text: str) -> str:
-    t = (history_text or "").lower()
-    strength_triggers = ["late", "advanced", "strength", "strengthening", "building", "stable", "improving", "finished", "completed", "progress"]
-    stretch_triggers  = ["early", "beginner", "just started", "still in pain", "sore", "acute", "flare", "tender", "recent", "physio", "rehab", "recovery"]
-    if any(k in t for k in strength_triggers):
-        return "strength"
-    if any(k in t for k in stretch_triggers):
-        return "stretch"
-    return ""
+# The spinner only shows on a cache miss, i.e. while Gemini is actually called.
+@st.cache_data(ttl=3600, show_spinner="Thinking…")
+def _ask_gemini(prompt: str) -> str:
+    # Raises on failure so errors are never cached; callers handle them.
+    # Deliberately one-shot rather than a per-session ChatSession: the API is
+    # stateless, so send_message re-sends the whole history each turn, while
+    # every prompt here is self-contained and shared across sessions.
+    # Not streamed: replies are parsed whole, never shown as they arrive.
+    resp = get_gemini_model().generate_content(prompt)
+    return resp.text.strip()
+
+MAX_MESSAGES = 50   # transcript cap; the greeting stays pinned at index 0
+
+def _append_msg(role: str, content: str):
+    msgs = st.session_state.messages
+    msgs.append({"role": role, "content": content})
+    if len(msgs) > MAX_MESSAGES:
+        st.session_state.messages = [msgs[0]] + msgs[-(MAX_MESSAGES - 1):]
+
+def _user(msg: str):
+    _append_msg("user", msg)
+
+def _bot(msg: str):
+    # Handlers always call _user() first, so compare whole exchanges: if this
+    # user+bot pair repeats the previous one (e.g. a double-submitted clarify
+    # branch), drop the just-added user line instead of posting both again.
+    msgs = st.session_state.messages
+    if len(msgs) >= 3 and msgs[-1]["role"] == "user" and \
+            msgs[-3:-1] == [msgs[-1], {"role": "bot", "content": msg}]:
+        msgs.pop()
+        return
+    _append_msg("bot", msg)
+
+LLM_DEBOUNCE_SEC = 0.5
+
+def debounce_llm():
+    """Stop this run if a Gemini-backed Send fired less than LLM_DEBOUNCE_SEC ago (double-clicks)."""
+    now = time.monotonic()
+    if now - st.session_state.setdefault("_last_llm_ts", 0.0) < LLM_DEBOUNCE_SEC:
+        st.stop()
+    st.session_state._last_llm_ts = now
 
 def ask_gemini_free(prompt: str) -> str:
-    model = genai.GenerativeModel("gemini-1.5-flash")
     try:
-        return model.generate_content(prompt).text.strip()
+        return _ask_gemini(prompt)
     except Exception as e:
         st.error(f"Gemini error: {e}")
         return ""
 
+def _parse_json_obj(resp: str) -> dict:
+    m = _JSON_RE.search(resp)
+    return json.loads(m.group(0)) if m else {}
+
+# (area, mode) -> exercise for areas the analyzer pages already cover; these
+# never need Gemini, and the same table is the fallback if Gemini fails.
+EXERCISE_TABLE = {
+    "upper back": {"stretch": "Squat", "strength": "Squat"},
+    "shoulder":   {"stretch": "Squat", "strength": "Squat"},
+    "knee":       {"stretch": "Squat", "strength": "Squat"},
+    "neck":       {"stretch": "Squat", "strength": "Squat"},
+    "hip":        {"stretch": "Leg Raises", "strength": "Squat"},
+}
+
 def gemini_pick_exercise(pain_area: str, mode: str) -> tuple[str, str]:
-    model = genai.GenerativeModel("gemini-1.5-flash")
+    bank = EXERCISE_TABLE.get(pain_area)
+    if bank and mode in bank:
+        return bank[mode], "This matches your stage and targets the area safely."
     prompt = f"""
 You are a physiotherapist. The user has '{pain_area}' pain and should focus on '{mode}' work.
 Recommend exactly ONE specific exercise name (short, proper name) and a one-sentence reason.
@@ -107,25 +164,39 @@ Example:
 {{"exercise":"Pendulum Stretch","why":"It gently mobilizes the shoulder without loading it."}}
 """
     try:
-        resp = model.generate_content(prompt).text.strip()
-        m = re.search(r"\{.*\}", resp, re.DOTALL)
-        data = json.loads(m.group(0)) if m else {}
+        data = _parse_json_obj(_ask_gemini(prompt))
         ex = (data.get("exercise") or "").strip()
         why = (data.get("why") or "").strip()
         if ex:
             return ex, (why or "This suits your current stage.")
     except Exception:
         pass
-    fallback = {
-        "upper back": {"stretch": "Squat", "strength": "Squat"},
-        "shoulder":   {"stretch": "Squat", "strength": "Squat"},
-        "knee":       {"stretch": "Squat", "strength": "Squat"},
-        "neck":       {"stretch": "Squat", "strength": "Squat"},
-        "hip":        {"stretch": "Leg Raises", "strength": "Squat"},
-    }
-    bank = fallback.get(pain_area, {"stretch": "Squat", "strength": "Squat"})
+    bank = EXERCISE_TABLE.get(pain_area, {"stretch": "Squat", "strength": "Squat"})
     return bank[mode], "This matches your stage and targets the area safely."
 
+def gemini_classify_and_pick(pain_area: str, history: str) -> dict:
+    """One round-trip for stage + exercise; returns {} if Gemini fails."""
+    prompt = f"""
+You are a physiotherapist. The user has '{pain_area}' pain.
+History: '{history}'.
+Decide whether they should focus on 'stretch' work (if early/sore) or 'strength' work (if late rehab/stable),
+then recommend exactly ONE specific exercise name (short, proper name) for that focus and a one-sentence reason.
+Return STRICT JSON with keys "mode", "exercise" and "why". "mode" must be "stretch" or "strength".
+Example:
+{{"mode":"stretch","exercise":"Pendulum Stretch","why":"It gently mobilizes the shoulder without loading it."}}
+"""
+    try:
+        data = _parse_json_obj(_ask_gemini(prompt))
+    except Exception as e:
+        st.error(f"Gemini error: {e}")
+        return {}
+    choice = (data.get("mode") or "").strip().lower()
+    return {
+        "mode": "strength" if "strength" in choice else ("stretch" if "stretch" in choice else ""),
+        "exercise": (data.get("exercise") or "").strip(),
+        "why": (data.get("why") or "").strip(),
+    }
+
 # ==============================
 # HEADER
 # ==============================
@@ -135,77 +206,163 @@ st.markdown(f"Let's figure out {header_pain_text(st.session_state.pain_area)} an
 # ==============================
 # CHAT UI
 # ==============================
-def render_chat():
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-    for m in st.session_state.messages:
-        cls = "user" if m["role"] == "user" else "bot"
-        st.markdown(f'<div class="chat-bubble {cls}">{m["content"]}</div>', unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-render_chat()
+def render_chat(target):
+    # One markdown element for the whole transcript. Content is escaped and
+    # newlines become <br> so a blank line can't end the HTML block early.
+    # The HTML is rebuilt only when the transcript changed since last run.
+    msgs = st.session_state.messages
+    key = (len(msgs), msgs[-1]["role"], msgs[-1]["content"]) if msgs else (0, "", "")
+    if st.session_state.get("_chat_html_key") != key:
+        parts = ['<div class="chat-container">']
+        for m in msgs:
+            cls = "user" if m["role"] == "user" else "bot"
+            body = html.escape(m["content"]).replace("\n", "<br>")
+            parts.append(f'<div class="chat-bubble {cls}">{body}</div>')
+        parts.append("</div>")
+        st.session_state["_chat_html"] = "".join(parts)
+        st.session_state["_chat_html_key"] = key
+    target.markdown(st.session_state["_chat_html"], unsafe_allow_html=True)
+
+# Rendered into a placeholder so branches that only add a bot message can
+# refresh it in place at the end of the run instead of calling st.rerun().
+chat_area = st.empty()
+render_chat(chat_area)
+chat_shown = st.session_state.messages[-1]
 
 # ==============================
 # FLOW
 # ==============================
 
+# Clarifying questions just add a bot message and return; chat_area picks
+# them up at the end of this run. st.rerun() is kept for step changes,
+# which swap out the widgets below.
+def handle_pain_input(user: str):
+    ul = user.lower()
+    # Debounce before recording the message, and only when this Send reaches
+    # Gemini: a second unclear answer after the one re-ask.
+    if (not st.session_state.awaiting_back_region and st.session_state.asked_clarify_pain
+            and not normalize_pain_area(ul)):
+        debounce_llm()
+    _user(user)
+    st.session_state.raw_pain_text = user
+
+    # If we're waiting for upper/lower clarification, handle that first
+    if st.session_state.awaiting_back_region:
+        lower = "lower" in ul
+        upper = "upper" in ul
+        if lower:
+            st.session_state.pain_area = "lower back"
+        elif upper:
+            st.session_state.pain_area = "upper back"
+        else:
+            if not st.session_state.asked_clarify_pain:
+                st.session_state.asked_clarify_pain = True
+                _bot("Please confirm: upper back or lower back?")
+                return
+            st.session_state.pain_area = "lower back"
+        st.session_state.awaiting_back_region = False
+        _bot("Got it — you mentioned lower back pain. What stage are you in right now (early stages of pain and soreness, or late rehab and strengthening)?")
+        st.session_state.step = 2
+        st.rerun()
+
+    # Normal first-time parsing
+    area = normalize_pain_area(ul)
+    if not area:
+        # one re-ask, then let Gemini try, otherwise default to lower back
+        if not st.session_state.asked_clarify_pain:
+            st.session_state.asked_clarify_pain = True
+            _bot("I didn't catch that. Could you say the body area (e.g., lower back, shoulder, knee)?")
+            return
+        ai = ask_gemini_free(f"The user wrote: '{user}'. Identify only the body area in 1-2 words (like 'lower back', 'shoulder').")
+        area = normalize_pain_area(ai.lower()) or "lower back"
+
+    if area == "back":
+        st.session_state.awaiting_back_region = True
+        _bot("Is it upper back or lower back?")
+        return
+
+    st.session_state.pain_area = area
+    # Updated wording here per your request
+    follow = (
+        "Got it — you mentioned lower back pain. What stage are you in right now (early stages of pain and soreness, or late rehab and strengthening)?"
+        if area == "lower back"
+        else f"Got it — you mentioned {area} pain. What stage are you in right now (early stages of pain and soreness, or late rehab and strengthening)?"
+    )
+    _bot(follow)
+    st.session_state.step = 2
+    st.rerun()
+
+def handle_stage_input(user: str):
+    # First, our fast classifier
+    mode = classify_mode(user.lower())
+
+    # Debounce before recording the message, and only when this Send reaches
+    # Gemini: stage unclear, or an area with no table entry.
+    pain = st.session_state.pain_area
+    if not mode or (pain != "lower back" and pain not in EXERCISE_TABLE):
+        debounce_llm()
+    _user(user)
+    st.session_state.history = user
+
+    # If ambiguous, ask Gemini: areas with no table entry also need an
+    # exercise, so get stage + pick in a single request; mapped areas (and
+    # lower back) only need the one-word stage answer
+    picked = {}
+    if not mode and pain != "lower back" and pain not in EXERCISE_TABLE:
+        picked = gemini_classify_and_pick(st.session_state.pain_area, user)
+        mode = picked.get("mode", "")
+    elif not mode:
+        choice = ask_gemini_free(
+            f"You are a physio.\n"
+            f"Pain area: {st.session_state.pain_area}.\n"
+            f"History: '{user}'.\n"
+            f"Choose ONE word only: stretch (if early/sore) or strength (if late rehab/stable).\n"
+            f"Answer with only that word."
+        ).lower()
+        mode = "strength" if "strength" in choice else ("stretch" if "stretch" in choice else "")
+
+    # If still unclear: show explicit chooser instead of defaulting
+    if not mode:
+        if not st.session_state.asked_clarify_stage:
+            st.session_state.asked_clarify_stage = True
+            _bot("Quick check: are you still early in pain and soreness (stretch), or in a strengthening phase (strength)?")
+            return
+        # show chooser on next render
+        st.session_state.awaiting_stage_choice = True
+        st.rerun()
+
+    st.session_state.mode = mode
+
+    # STEP 3 — RECOMMENDATION
+    pain = st.session_state.pain_area
+    if pain == "lower back":
+        exercise = "Leg Raises" if mode == "stretch" else "Squat"
+        reason = "this best matches your current stage and targets the lower back safely."
+    elif picked.get("exercise") and pain not in EXERCISE_TABLE:
+        exercise, reason = picked["exercise"], (picked["why"] or "This suits your current stage.")
+    else:
+        exercise, reason = gemini_pick_exercise(pain, mode)
+
+    st.session_state.exercise_name = exercise
+    st.session_state.reasoning = reason
+
+    rec_line = "do a stretch" if mode == "stretch" else "do a strengthening exercise"
+    _bot(f"You should {rec_line} because {reason} I recommend the {exercise}. \n\nClick below to get started.")
+
+    st.session_state.step = 3
+    st.rerun()
+
 # STEP 1 — PAIN AREA (and possibly ask upper/lower)
 if st.session_state.step == 1:
-    user = st.text_input("You:", key="pain_input", placeholder="e.g. lower back pain, shoulder pain…")
-    if st.button("Send"):
+    # Form: typing doesn't rerun the script, only the Send submit does
+    with st.form("pain_form", clear_on_submit=True):
+        user = st.text_input("You:", key="pain_input", placeholder="e.g. lower back pain, shoulder pain…")
+        submitted = st.form_submit_button("Send")
+    if submitted:
         user = user.strip()
         if not user:
             st.stop()
-        st.session_state.messages.append({"role": "user", "content": user})
-        st.session_state.raw_pain_text = user
-
-        # If we're waiting for upper/lower clarification, handle that first
-        if st.session_state.awaiting_back_region:
-            lower = "lower" in user.lower()
-            upper = "upper" in user.lower()
-            if lower:
-                st.session_state.pain_area = "lower back"
-            elif upper:
-                st.session_state.pain_area = "upper back"
-            else:
-                if not st.session_state.asked_clarify_pain:
-                    st.session_state.asked_clarify_pain = True
-                    st.session_state.messages.append({"role": "bot", "content": "Please confirm: upper back or lower back?"})
-                    st.rerun()
-                st.session_state.pain_area = "lower back"
-            st.session_state.awaiting_back_region = False
-            st.session_state.messages.append({
-                "role": "bot",
-                "content": "Got it — you mentioned lower back pain. What stage are you in right now (early stages of pain and soreness, or late rehab and strengthening)?",
-            })
-            st.session_state.step = 2
-            st.rerun()
-
-        # Normal first-time parsing
-        area = normalize_pain_area(user)
-        if not area:
-            # one re-ask, then let Gemini try, otherwise default to lower back
-            if not st.session_state.asked_clarify_pain:
-                st.session_state.asked_clarify_pain = True
-                st.session_state.messages.append({"role": "bot", "content": "I didn't catch that. Could you say the body area (e.g., lower back, shoulder, knee)?"})
-                st.rerun()
-            ai = ask_gemini_free(f"The user wrote: '{user}'. Identify only the body area in 1-2 words (like 'lower back', 'shoulder').")
-            area = normalize_pain_area(ai) or "lower back"
-
-        if area == "back":
-            st.session_state.awaiting_back_region = True
-            st.session_state.messages.append({"role": "bot", "content": "Is it upper back or lower back?"})
-            st.rerun()
-
-        st.session_state.pain_area = area
-        # Updated wording here per your request
-        follow = (
-            "Got it — you mentioned lower back pain. What stage are you in right now (early stages of pain and soreness, or late rehab and strengthening)?"
-            if area == "lower back"
-            else f"Got it — you mentioned {area} pain. What stage are you in right now (early stages of pain and soreness, or late rehab and strengthening)?"
-        )
-        st.session_state.messages.append({"role": "bot", "content": follow})
-        st.session_state.step = 2
-        st.rerun()
+        handle_pain_input(user)
 
 # STEP 2 — HISTORY/STAGE → MODE
 elif st.session_state.step == 2:
@@ -232,59 +389,14 @@ elif st.session_state.step == 2:
                 st.session_state.awaiting_stage_choice = False
                 st.rerun()
 
-    user = st.text_area("You:", key="stage_input", placeholder="e.g. early rehab and still sore / late rehab and strengthening")
-    if st.button("Send"):
+    with st.form("stage_form", clear_on_submit=True):
+        user = st.text_area("You:", key="stage_input", placeholder="e.g. early rehab and still sore / late rehab and strengthening")
+        submitted = st.form_submit_button("Send")
+    if submitted:
         user = user.strip()
         if not user:
             st.stop()
-        st.session_state.messages.append({"role": "user", "content": user})
-        st.session_state.history = user
-
-        # First, our fast classifier
-        mode = classify_mode(user)
-
-        # If ambiguous, ask Gemini for a one-word choice
-        if not mode:
-            choice = ask_gemini_free(
-                f"You are a physio.\n"
-                f"Pain area: {st.session_state.pain_area}.\n"
-                f"History: '{user}'.\n"
-                f"Choose ONE word only: stretch (if early/sore) or strength (if late rehab/stable).\n"
-                f"Answer with only that word."
-            ).lower()
-            mode = "strength" if "strength" in choice else ("stretch" if "stretch" in choice else "")
-
-        # If still unclear: show explicit chooser instead of defaulting
-        if not mode:
-            if not st.session_state.asked_clarify_stage:
-                st.session_state.asked_clarify_stage = True
-                st.session_state.messages.append({"role": "bot", "content": "Quick check: are you still early in pain and soreness (stretch), or in a strengthening phase (strength)?"})
-                st.rerun()
-            # show chooser on next render
-            st.session_state.awaiting_stage_choice = True
-            st.rerun()
-
-        st.session_state.mode = mode
-
-        # STEP 3 — RECOMMENDATION
-        pain = st.session_state.pain_area
-        if pain == "lower back":
-            exercise = "Leg Raises" if mode == "stretch" else "Squat"
-            reason = "this best matches your current stage and targets the lower back safely."
-        else:
-            exercise, reason = gemini_pick_exercise(pain, mode)
-
-        st.session_state.exercise_name = exercise
-        st.session_state.reasoning = reason
-
-        rec_line = "do a stretch" if mode == "stretch" else "do a strengthening exercise"
-        st.session_state.messages.append({
-            "role": "bot",
-            "content": f"You should {rec_line} because {reason} I recommend the {exercise}. \n\nClick below to get started.",
-        })
-
-        st.session_state.step = 3
-        st.rerun()
+        handle_stage_input(user)
 
 # ==============================
 # STEP 3 — REDIRECT + RESTART
@@ -310,7 +422,10 @@ elif st.session_state.step == 3:
             st.switch_page("pages/1_📷️_Live_Stream.py")
 
     if st.button("Start Over"):
-        for k in list(defaults.keys()):
+        for k in list(DEFAULTS.keys()) + ["_init"]:
             st.session_state.pop(k, None)
         st.rerun()
 
+# Clarifying questions added during this run
+if st.session_state.messages[-1] is not chat_shown:
+    render_chat(chat_area)
@@ -0,0 +1,48 @@
+# angles_jit.py
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # plain Python fallback; same results, just not compiled
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+@njit(cache=True, fastmath=True)
+def _angle(p1x, p1y, p2x, p2y, ref_x, ref_y):
+    # Angle at ref between ref->p1 and ref->p2, via atan2(|cross|, dot):
+    # no sqrt/division, and stable near 0 and 180 degrees.
+    v1x = float(p1x - ref_x)
+    v1y = float(p1y - ref_y)
+    v2x = float(p2x - ref_x)
+    v2y = float(p2y - ref_y)
+    cross = v1x * v2y - v1y * v2x
+    dot = v1x * v2x + v1y * v2y
+    return math.degrees(math.atan2(abs(cross), dot))
+
+
+@njit(cache=True, fastmath=True)
+def compute_all(nose, l_sh, r_sh, sh, hip, knee, ankle):
+    """
+    All per-frame leg-raise angles in one call, truncated to int like utils.find_angle:
+      offset     - shoulders seen from the nose (camera alignment)
+      hip_flex   - knee/shoulder angle at the hip
+      knee_int   - hip/ankle angle at the knee (180 = straight)
+      torso_tilt - shoulder vs vertical through the hip
+    """
+    offset = _angle(l_sh[0], l_sh[1], r_sh[0], r_sh[1], nose[0], nose[1])
+    hip_flex = _angle(knee[0], knee[1], sh[0], sh[1], hip[0], hip[1])
+    knee_int = _angle(hip[0], hip[1], ankle[0], ankle[1], knee[0], knee[1])
+    torso_tilt = _angle(sh[0], sh[1], hip[0], 0, hip[0], hip[1])
+    return int(offset), int(hip_flex), int(knee_int), int(torso_tilt)
+
+
+def warmup(dtype=np.int32):
+    """Compile compute_all for `dtype` points up front so the first frame doesn't pay for it."""
+    p = np.zeros(2, dtype=dtype)
+    q = np.ones(2, dtype=dtype)
+    compute_all(p, q, p, q, p, q, p)
@@ -0,0 +1,46 @@
+# chat_utils.py
+# Pure text helpers for the Home.py chatbot. They live in an imported module
+# so the compiled patterns and lru_caches survive Streamlit reruns, which
+# re-execute Home.py from the top.
+import re
+from functools import lru_cache
+
+KNOWN_AREAS = [
+    "lower back","low back","upper back","back","shoulder","knee","neck","hip","ankle",
+    "elbow","wrist","hamstring","quad","calf","glute","groin"
+]
+STRENGTH_TRIGGERS = ["late", "advanced", "strength", "strengthening", "building", "stable", "improving", "finished", "completed", "progress"]
+STRETCH_TRIGGERS  = ["early", "beginner", "just started", "still in pain", "sore", "acute", "flare", "tender", "recent", "physio", "rehab", "recovery"]
+
+def _alternation(words) -> re.Pattern:
+    # longest first so e.g. "lower back" wins over "back"
+    return re.compile("|".join(map(re.escape, sorted(words, key=len, reverse=True))))
+
+_KNOWN_RE = _alternation(KNOWN_AREAS)
+_STRENGTH_RE = _alternation(STRENGTH_TRIGGERS)
+_STRETCH_RE = _alternation(STRETCH_TRIGGERS)
+
+
+@lru_cache(maxsize=512)
+def normalize_pain_area(text: str) -> str:
+    # expects lowercased input (callers lower once per message)
+    t = text or ""
+    if any(x in t for x in ["lower back","low back","lower-back"]):
+        return "lower back"
+    if "upper back" in t or "upper-back" in t:
+        return "upper back"
+    if "back" in t:
+        return "back"  # generic; we will ask upper/lower
+    m = _KNOWN_RE.search(t)
+    return m.group(0) if m else ""
+
+
+@lru_cache(maxsize=512)
+def classify_mode(history_text: str) -> str:
+    # expects lowercased input
+    t = history_text or ""
+    if _STRENGTH_RE.search(t):
+        return "strength"
+    if _STRETCH_RE.search(t):
+        return "stretch"
+    return ""
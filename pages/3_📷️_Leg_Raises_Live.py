@@ -10,7 +10,6 @@ BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
 sys.path.append(BASE_DIR)
 
 
-from utils import get_mediapipe_pose
 from process_frame_leg_raises import ProcessFrame
 from thresholds import get_thresholds_leg_raises_beginner, get_thresholds_leg_raises_pro
 
@@ -28,9 +27,18 @@ elif mode == 'Pro':
     thresholds = get_thresholds_leg_raises_pro()
 
 
-live_process_frame = ProcessFrame(thresholds=thresholds, flip_frame=True)
-# Initialize face mesh solution
-pose = get_mediapipe_pose()
+# Pose graph and rep state are built once per session, not on every rerun.
+if 'leg_raises_live_pose' not in st.session_state:
+    st.session_state['leg_raises_live_pose'] = ProcessFrame.build_pose()
+pose = st.session_state['leg_raises_live_pose']
+
+frame_key = f'leg_raises_live_{mode}'
+if frame_key not in st.session_state:
+    st.session_state[frame_key] = ProcessFrame(thresholds=thresholds, flip_frame=True)
+live_process_frame = st.session_state[frame_key]
+
+if st.button('Reset Counters'):
+    live_process_frame.reset()
 
 
 if 'download' not in st.session_state:
@@ -10,7 +10,7 @@ BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
 sys.path.append(BASE_DIR)
 
 
-from utils import get_mediapipe_pose
+from utils import PoseWorker, FrameWriter
 from process_frame_leg_raises import ProcessFrame
 from thresholds import get_thresholds_leg_raises_beginner, get_thresholds_leg_raises_pro
 
@@ -32,10 +32,15 @@ elif mode == 'Pro':
 
 
 
-upload_process_frame = ProcessFrame(thresholds=thresholds)
+# Pose graph and rep state are built once per session, not on every rerun.
+if 'leg_raises_upload_pose' not in st.session_state:
+    st.session_state['leg_raises_upload_pose'] = ProcessFrame.build_pose()
+pose = st.session_state['leg_raises_upload_pose']
 
-# Initialize face mesh solution
-pose = get_mediapipe_pose()
+frame_key = f'leg_raises_upload_{mode}'
+if frame_key not in st.session_state:
+    st.session_state[frame_key] = ProcessFrame(thresholds=thresholds)
+upload_process_frame = st.session_state[frame_key]
 
 
 download = None
@@ -67,6 +72,10 @@ download_button = st.empty()
 if up_file and uploaded:
     
     download_button.empty()
+    # each upload is a new session: fresh counters, landmark smoothing and
+    # MediaPipe tracking state (the previous run's worker is already closed)
+    upload_process_frame.reset()
+    pose.reset()
     tfile = tempfile.NamedTemporaryFile(delete=False)
 
     try:
@@ -75,33 +84,54 @@ if up_file and uploaded:
 
         vf = cv2.VideoCapture(tfile.name)
 
+        txt = st.sidebar.markdown(ip_vid_str, unsafe_allow_html=True)   
+        ip_video = st.sidebar.video(tfile.name) 
+
+        def write_frame(frame, landmarks):
+            out_frame, _ = upload_process_frame.process_landmarks(frame, landmarks)
+            stframe.image(out_frame)
+            video_output.write(out_frame[...,::-1])
+
         # ---------------------  Write the processed video frame. --------------------
         fps = int(vf.get(cv2.CAP_PROP_FPS))
         width = int(vf.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(vf.get(cv2.CAP_PROP_FRAME_HEIGHT))
         frame_size = (width, height)
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        video_output = cv2.VideoWriter(output_video_file, fourcc, fps, frame_size)
+        # encoded on a background thread (see utils.FrameWriter)
+        video_output = FrameWriter(cv2.VideoWriter(output_video_file, fourcc, fps, frame_size))
         # -----------------------------------------------------------------------------
 
-        
-        txt = st.sidebar.markdown(ip_vid_str, unsafe_allow_html=True)   
-        ip_video = st.sidebar.video(tfile.name) 
-
-        while vf.isOpened():
-            ret, frame = vf.read()
-            if not ret:
-                break
-
-            # convert frame from BGR to RGB before processing it.
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            out_frame, _ = upload_process_frame.process(frame, pose)
-            stframe.image(out_frame)
-            video_output.write(out_frame[...,::-1])
+        # Pose inference runs on a worker thread, one frame ahead of drawing.
+        pose_worker = PoseWorker(pose, scale=thresholds.get('POSE_SCALE', 1.0))
+        try:
+            in_flight = 0
+
+            while vf.isOpened():
+                ret, frame = vf.read()
+                if not ret:
+                    break
+
+                # convert frame from BGR to RGB before processing it.
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                pose_worker.submit(frame)
+                in_flight += 1
+
+                if in_flight > 1:
+                    write_frame(*pose_worker.get())
+                    in_flight -= 1
+
+            for _ in range(in_flight):
+                write_frame(*pose_worker.get())
+        finally:
+            # also on errors and reruns, so the worker never outlives this run
+            # and can't be inside pose.process when the next run starts
+            pose_worker.close()
+            # finalizes the mp4 and stops the writer thread
+            video_output.release()
 
         
         vf.release()
-        video_output.release()
         stframe.empty()
         ip_video.empty()
         txt.empty()
@@ -1,9 +1,21 @@
 # process_frame_leg_raise.py
 import time
+from bisect import bisect_right
+
 import cv2
 import numpy as np
 
-from utils import find_angle, get_landmark_features, draw_text, draw_dotted_line
+from utils import draw_text, draw_dotted_line, get_mediapipe_pose, resize_for_pose, OneEuroFilter
+from angles_jit import compute_all, warmup
+
+
+# Rep phases: s2 once (RAISING), then s3 once (TOP), then s2 once (LOWERING)
+IDLE, RAISING, TOP, LOWERING = 0, 1, 2, 3
+PHASE_TRANSITIONS = {
+    (IDLE, 's2'): RAISING,
+    (RAISING, 's3'): TOP,
+    (TOP, 's2'): LOWERING,
+}
 
 
 class ProcessFrame:
@@ -27,6 +39,41 @@ class ProcessFrame:
         # Thresholds
         self.thresholds = thresholds
 
+        # Frame-invariant thresholds unpacked once (avoids dict lookups per frame)
+        band = thresholds['HIP_KNEE_VERT']
+        self._n_lo, self._n_hi = band['NORMAL']
+        self._t_lo, self._t_hi = band['TRANS']
+        self._p_lo, self._p_hi = band['PASS']
+        # _get_state bins: bisect over band edges (upper edges +1 since the angle is an int)
+        self._state_edges = (self._n_lo, self._n_hi + 1, self._t_lo, self._t_hi + 1, self._p_lo, self._p_hi + 1)
+        self._state_lut = (None, 's1', None, 's2', None, 's3', None)
+        self._knee_lock_max = thresholds['KNEE_LOCK_MAX']
+        self._torso_tilt_max = thresholds['TORSO_TILT_MAX']
+        self._offset_thresh = thresholds['OFFSET_THRESH']
+        self._inactive_thresh = thresholds['INACTIVE_THRESH']
+        self._rep_min_range = thresholds['REP_MIN_RANGE']
+        self._cnt_frame_thresh = thresholds['CNT_FRAME_THRESH']
+
+        # Skip-frame pose detection: run pose.process every POSE_SKIP frames and
+        # reuse the last landmarks in between; smoothing hides the step at each update.
+        self._pose_skip = max(1, int(thresholds.get('POSE_SKIP', 1)))
+        self._frame_ctr = 0
+        self._last_landmarks = None
+        self._landmark_filter = OneEuroFilter() if self._pose_skip > 1 else None
+        # Frames are downscaled by POSE_SCALE before pose.process
+        self._pose_scale = thresholds.get('POSE_SCALE', 1.0)
+
+        # Idle cheap path: after IDLE_SKIP_DRAW frames resting in s1 with no
+        # feedback showing, skip the skeleton drawing and keep only the overlay.
+        self._idle_skip_draw = thresholds.get('IDLE_SKIP_DRAW', 30)
+        self._same_state_frames = 0
+        self._last_state = None
+        # set by reset(), applied by the thread that processes frames
+        self._reset_pending = False
+
+        # Compile the angle kernel now rather than on the first frame
+        warmup(np.int16)
+
         # Text/lines
         self.font = cv2.FONT_HERSHEY_SIMPLEX
         self.linetype = cv2.LINE_AA
@@ -69,10 +116,22 @@ class ProcessFrame:
         self.dict_features['right'] = self.right_features
         self.dict_features['nose'] = 0
 
+        # Landmark indices gathered each frame, in unpack order: nose, left side, right side
+        self._idx = np.array(
+            [self.dict_features['nose']] + list(self.left_features.values()) + list(self.right_features.values()),
+            dtype=np.int32,
+        )
+
+        # Scratch buffers for the landmark gather, filled in place every frame
+        # (pixel coords fit comfortably in int16)
+        self._landmark_buf = np.empty((33, 2), dtype=np.float32)
+        self._gather_buf = np.empty((len(self._idx), 2), dtype=np.float32)
+        self._pts_buf = np.empty((len(self._idx), 2), dtype=np.int16)
+
         # State + counters
         self.state_tracker = {
             # state machine / sequence
-            'state_seq': [],         # expects ['s2', 's3', 's2'] between s1 rests
+            'phase': IDLE,           # rep FSM: IDLE → RAISING → TOP → LOWERING between s1 rests
             'prev_state': None,
             'curr_state': None,
 
@@ -89,8 +148,8 @@ class ProcessFrame:
             'INACTIVE_TIME_FRONT': 0.0,
 
             # display/counters
-            'DISPLAY_TEXT': np.full((4,), False),   # indexes into FEEDBACK_ID_MAP
-            'COUNT_FRAMES': np.zeros((4,), dtype=np.int64),
+            'DISPLAY_TEXT': 0,                      # bitmask: bit i -> FEEDBACK_ID_MAP[i]
+            'COUNT_FRAMES': [0, 0, 0, 0],           # frames each banner has been shown
             'INCORRECT_POSTURE': False,
 
             'CORRECT_COUNT': 0,
@@ -106,37 +165,48 @@ class ProcessFrame:
             3: ('CONTROL LOWERING',       90, (255, 80, 80)),   # dropped s3->s1 without s2
         }
 
+    @staticmethod
+    def build_pose():
+        """
+        Pose configured for real-time leg raises: the lite model (complexity 0),
+        MediaPipe's own landmark smoothing on, and no segmentation mask.
+        """
+        return get_mediapipe_pose(
+            model_complexity=0,
+            smooth_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+
     # ---------------------------- helpers ---------------------------- #
 
     def _get_state(self, hip_flex_vertical_angle):
         """
         Map hip-flexion angle (0..~95) to s1/s2/s3 using thresholds['HIP_KNEE_VERT'].
         """
-        band = self.thresholds['HIP_KNEE_VERT']
-        st = None
-        if band['NORMAL'][0] <= hip_flex_vertical_angle <= band['NORMAL'][1]:
-            st = 's1'
-        elif band['TRANS'][0] <= hip_flex_vertical_angle <= band['TRANS'][1]:
-            st = 's2'
-        elif band['PASS'][0] <= hip_flex_vertical_angle <= band['PASS'][1]:
-            st = 's3'
-        return st
+        return self._state_lut[bisect_right(self._state_edges, hip_flex_vertical_angle)]
 
     def _update_state_sequence(self, state):
         """
         Enforce: enter s2 once, then s3 once, then s2 once (like in the squat code).
+        Any other (phase, state) pair leaves the phase unchanged.
         """
-        if state == 's2':
-            if (('s3' not in self.state_tracker['state_seq']) and (self.state_tracker['state_seq'].count('s2') == 0)) or \
-               (('s3' in self.state_tracker['state_seq']) and (self.state_tracker['state_seq'].count('s2') == 1)):
-                self.state_tracker['state_seq'].append('s2')
-
-        elif state == 's3':
-            if ('s3' not in self.state_tracker['state_seq']) and ('s2' in self.state_tracker['state_seq']):
-                self.state_tracker['state_seq'].append('s3')
-
-    def _show_feedback(self, frame, c_frame, dict_maps):
-        for idx in np.where(c_frame)[0]:
+        nxt = PHASE_TRANSITIONS.get((self.state_tracker['phase'], state))
+        if nxt is not None:
+            self.state_tracker['phase'] = nxt
+
+    def _set_bit(self, idx):
+        self.state_tracker['DISPLAY_TEXT'] |= 1 << idx
+
+    def _clear_bit(self, idx):
+        # hide banner idx and restart its lifetime
+        self.state_tracker['DISPLAY_TEXT'] &= ~(1 << idx)
+        self.state_tracker['COUNT_FRAMES'][idx] = 0
+
+    def _show_feedback(self, frame, mask, dict_maps):
+        for idx in range(4):
+            if not mask & (1 << idx):
+                continue
             draw_text(
                 frame,
                 dict_maps[idx][0],
@@ -148,8 +218,8 @@ class ProcessFrame:
         return frame
 
     def _reset_live_flags(self):
-        self.state_tracker['DISPLAY_TEXT'][:] = False
-        self.state_tracker['COUNT_FRAMES'][:] = 0
+        self.state_tracker['DISPLAY_TEXT'] = 0
+        self.state_tracker['COUNT_FRAMES'][:] = (0, 0, 0, 0)
         self.state_tracker['INCORRECT_POSTURE'] = False
         self.state_tracker['s3_enter_time'] = None
         self.state_tracker['s3_hold_ok'] = False
@@ -161,7 +231,7 @@ class ProcessFrame:
         self.state_tracker['CORRECT_COUNT'] = 0
         self.state_tracker['INCORRECT_COUNT'] = 0
 
-        self.state_tracker['state_seq'] = []
+        self.state_tracker['phase'] = IDLE
         self.state_tracker['prev_state'] = None
         self.state_tracker['curr_state'] = None
 
@@ -173,29 +243,68 @@ class ProcessFrame:
         self.state_tracker['INACTIVE_TIME_FRONT'] = 0.0
         self.state_tracker['start_inactive_time_front'] = time.perf_counter()
 
+        # idle cheap path starts counting again, so the skeleton shows right away
+        self._same_state_frames = 0
+        self._last_state = None
+
+    def reset(self):
+        """
+        Start a fresh session: counters, rep state and landmark smoothing.
+        Only flags the reset; the next process()/process_landmarks() call does it,
+        so it is safe to call from the script thread while a WebRTC callback runs.
+        """
+        self._reset_pending = True
+
+    def _apply_pending_reset(self):
+        if not self._reset_pending:
+            return
+        self._reset_pending = False
+        self._hard_reset_all()
+        self._frame_ctr = 0
+        self._last_landmarks = None
+        if self._landmark_filter is not None:
+            self._landmark_filter.reset()
+
     # -------------------------- main entry -------------------------- #
 
     def process(self, frame: np.array, pose):
         """
         Process a frame for the leg-raise. Returns (frame, play_sound)
         """
+        self._apply_pending_reset()
+
+        # Pose estimation (every POSE_SKIP frames; retried each frame while nobody is found)
+        if self._frame_ctr % self._pose_skip == 0 or self._last_landmarks is None:
+            self._last_landmarks = pose.process(resize_for_pose(frame, self._pose_scale)).pose_landmarks
+        self._frame_ctr += 1
+        # smooth only here, where reused landmarks make the skeleton step
+        return self.process_landmarks(frame, self._last_landmarks, smooth=True)
+
+    def process_landmarks(self, frame: np.array, pose_landmarks, smooth=False):
+        """
+        Same as process() but with landmarks already computed for this frame
+        (e.g. by a utils.PoseWorker running inference ahead on another thread).
+        smooth=True runs the points through the skip-frame One Euro filter.
+        Returns (frame, play_sound)
+        """
+        self._apply_pending_reset()
+
         play_sound = None
         frame_height, frame_width, _ = frame.shape
-
-        # Pose estimation
-        keypoints = pose.process(frame)
+        now = time.perf_counter()   # one clock read per frame; every timer below uses it
 
         # No landmarks → inactivity accumulation & minimal overlay
-        if not keypoints.pose_landmarks:
+        if not pose_landmarks:
+            if self._landmark_filter is not None:
+                self._landmark_filter.reset()
             if self.flip_frame:
                 frame = cv2.flip(frame, 1)
 
             # Inactivity accounting (side view)
-            end_time = time.perf_counter()
-            self.state_tracker['INACTIVE_TIME'] += end_time - self.state_tracker['start_inactive_time']
-            self.state_tracker['start_inactive_time'] = end_time
+            self.state_tracker['INACTIVE_TIME'] += now - self.state_tracker['start_inactive_time']
+            self.state_tracker['start_inactive_time'] = now
 
-            display_inactivity = self.state_tracker['INACTIVE_TIME'] >= self.thresholds['INACTIVE_THRESH']
+            display_inactivity = self.state_tracker['INACTIVE_TIME'] >= self._inactive_thresh
 
 
             if display_inactivity:
@@ -205,30 +314,51 @@ class ProcessFrame:
             return frame, play_sound
 
         # -------- Landmarks present -------- #
-        ps_lm = keypoints.pose_landmarks
+        ps_lm = pose_landmarks
 
-        # Get features for both sides + nose for offset
-        nose_coord = get_landmark_features(ps_lm.landmark, self.dict_features, 'nose',
-                                           frame_width, frame_height)
-        l_sh, l_el, l_wr, l_hip, l_knee, l_ankle, l_foot = get_landmark_features(
-            ps_lm.landmark, self.dict_features, 'left', frame_width, frame_height
-        )
-        r_sh, r_el, r_wr, r_hip, r_knee, r_ankle, r_foot = get_landmark_features(
-            ps_lm.landmark, self.dict_features, 'right', frame_width, frame_height
+        # Get features for both sides + nose for offset (one gather over all 33 landmarks,
+        # into preallocated buffers; the unpacked points below are views valid for this frame)
+        lm_xy = self._landmark_buf
+        for i, lm in enumerate(ps_lm.landmark):
+            lm_xy[i, 0] = lm.x
+            lm_xy[i, 1] = lm.y
+        np.take(lm_xy, self._idx, axis=0, out=self._gather_buf)
+        self._gather_buf *= (frame_width, frame_height)
+        pts = self._pts_buf
+        np.copyto(pts, self._gather_buf, casting='unsafe')   # truncates like int()
+
+        if smooth and self._landmark_filter is not None:
+            np.copyto(pts, self._landmark_filter(pts, now), casting='unsafe')
+
+        (nose_coord, l_sh, l_el, l_wr, l_hip, l_knee, l_ankle, l_foot,
+         r_sh, r_el, r_wr, r_hip, r_knee, r_ankle, r_foot) = pts
+
+        # Choose the better-visible side (use shoulder-foot vertical span)
+        dist_l = abs(l_foot[1] - l_sh[1])
+        dist_r = abs(r_foot[1] - r_sh[1])
+
+        if dist_l >= dist_r:
+            sh, el, wr, hip, knee, ankle, foot = l_sh, l_el, l_wr, l_hip, l_knee, l_ankle, l_foot
+            multiplier = -1
+        else:
+            sh, el, wr, hip, knee, ankle, foot = r_sh, r_el, r_wr, r_hip, r_knee, r_ankle, r_foot
+            multiplier = 1
+
+        # All angles in one compiled call (see angles_jit.compute_all)
+        offset_angle, hip_flex, knee_internal, torso_tilt = compute_all(
+            nose_coord, l_sh, r_sh, sh, hip, knee, ankle
         )
 
         # Camera alignment: nose + shoulders angle → if too "front", warn & pause logic
-        offset_angle = find_angle(l_sh, r_sh, nose_coord)
-        if offset_angle > self.thresholds['OFFSET_THRESH']:
+        if offset_angle > self._offset_thresh:
             # Accumulate "front" inactivity
-            end_time = time.perf_counter()
-            self.state_tracker['INACTIVE_TIME_FRONT'] += end_time - self.state_tracker['start_inactive_time_front']
-            self.state_tracker['start_inactive_time_front'] = end_time
+            self.state_tracker['INACTIVE_TIME_FRONT'] += now - self.state_tracker['start_inactive_time_front']
+            self.state_tracker['start_inactive_time_front'] = now
 
             # Show alignment info + counters
-            cv2.circle(frame, tuple(nose_coord), 7, self.COLORS['white'], -1)
-            cv2.circle(frame, tuple(l_sh), 7, self.COLORS['yellow'], -1)
-            cv2.circle(frame, tuple(r_sh), 7, self.COLORS['magenta'], -1)
+            cv2.circle(frame, tuple(nose_coord.tolist()), 7, self.COLORS['white'], -1)
+            cv2.circle(frame, tuple(l_sh.tolist()), 7, self.COLORS['yellow'], -1)
+            cv2.circle(frame, tuple(r_sh.tolist()), 7, self.COLORS['magenta'], -1)
 
             if self.flip_frame:
                 frame = cv2.flip(frame, 1)
@@ -242,63 +372,63 @@ class ProcessFrame:
                       font_scale=0.65, text_color_bg=(255, 153, 0))
 
             # If front-inactive too long → hard reset
-            if self.state_tracker['INACTIVE_TIME_FRONT'] >= self.thresholds['INACTIVE_THRESH']:
+            if self.state_tracker['INACTIVE_TIME_FRONT'] >= self._inactive_thresh:
                 play_sound = 'reset_counters'
                 self._hard_reset_all()
 
             # Reset side-view inactivity accumulators
             self.state_tracker['INACTIVE_TIME'] = 0.0
-            self.state_tracker['start_inactive_time'] = time.perf_counter()
+            self.state_tracker['start_inactive_time'] = now
             return frame, play_sound
 
         # Camera aligned → reset "front" timer
         self.state_tracker['INACTIVE_TIME_FRONT'] = 0.0
-        self.state_tracker['start_inactive_time_front'] = time.perf_counter()
-
-        # Choose the better-visible side (use shoulder-foot vertical span)
-        dist_l = abs(l_foot[1] - l_sh[1])
-        dist_r = abs(r_foot[1] - r_sh[1])
-
-        if dist_l >= dist_r:
-            sh, el, wr, hip, knee, ankle, foot = l_sh, l_el, l_wr, l_hip, l_knee, l_ankle, l_foot
-            multiplier = -1
-        else:
-            sh, el, wr, hip, knee, ankle, foot = r_sh, r_el, r_wr, r_hip, r_knee, r_ankle, r_foot
-            multiplier = 1
+        self.state_tracker['start_inactive_time_front'] = now
 
         # ------------------ Angles ------------------ #
         # Hip flexion (state driver) — more lenient reference:
         # use thigh vs torso: hip→knee against hip→shoulder, then invert to grow with flexion.
-        hip_vertical = 180 - find_angle(knee, sh, hip)
+        hip_vertical = 180 - hip_flex
 
         # Knee straightness: 180° is straight; compute flexion = 180 - angle at knee
-        knee_internal = find_angle(hip, ankle, knee)     # 0..180
+        # (knee_internal is 0..180)
         knee_flexion = max(0, 180 - int(knee_internal))  # 0..180, small is straighter
 
-        # Torso tilt vs vertical through hip (arch/rock control)
-        torso_tilt = find_angle(sh, np.array([hip[0], 0]), hip)
+        # torso_tilt: torso vs vertical through hip (arch/rock control)
 
         # ------------------ Drawing guides ------------------ #
-        # Vertical dotted lines at hip/knee for visual reference
-        draw_dotted_line(frame, hip, start=hip[1] - 80, end=hip[1] + 20, line_color=self.COLORS['blue'])
-        draw_dotted_line(frame, knee, start=knee[1] - 50, end=knee[1] + 20, line_color=self.COLORS['blue'])
-
-        # Skeleton lines (same style as squat)
-        cv2.line(frame, tuple(sh), tuple(hip), self.COLORS['light_blue'], 4, lineType=self.linetype)
-        cv2.line(frame, tuple(hip), tuple(knee), self.COLORS['light_blue'], 4, lineType=self.linetype)
-        cv2.line(frame, tuple(knee), tuple(ankle), self.COLORS['light_blue'], 4, lineType=self.linetype)
-        cv2.line(frame, tuple(ankle), tuple(foot), self.COLORS['light_blue'], 4, lineType=self.linetype)
-
-        for p in (sh, hip, knee, ankle, foot):
-            cv2.circle(frame, tuple(p), 7, self.COLORS['yellow'], -1, lineType=self.linetype)
+        # Joint points as native-int tuples, converted once for every cv2 call below
+        # (int32 here: cv2.polylines rejects int16 points)
+        joints = np.array((sh, hip, knee, ankle, foot), dtype=np.int32)
+        sh_t, hip_t, knee_t, ankle_t, foot_t = map(tuple, joints.tolist())
 
         # State from hip flexion
         current_state = self._get_state(int(hip_vertical))
         self.state_tracker['curr_state'] = current_state
         self._update_state_sequence(current_state)
 
+        if current_state == self._last_state:
+            self._same_state_frames += 1
+        else:
+            self._same_state_frames = 0
+            self._last_state = current_state
+
+        idle = (current_state == 's1' and self._same_state_frames > self._idle_skip_draw
+                and self.state_tracker['DISPLAY_TEXT'] == 0)
+        if not idle:
+            # Vertical dotted lines at hip/knee for visual reference
+            draw_dotted_line(frame, hip_t, start=hip_t[1] - 80, end=hip_t[1] + 20, line_color=self.COLORS['blue'])
+            draw_dotted_line(frame, knee_t, start=knee_t[1] - 50, end=knee_t[1] + 20, line_color=self.COLORS['blue'])
+
+            # Skeleton lines (same style as squat)
+            # (one open polyline shoulder→hip→knee→ankle→foot instead of four cv2.line calls)
+            cv2.polylines(frame, [joints], False, self.COLORS['light_blue'], 4, lineType=self.linetype)
+
+            for p in (sh_t, hip_t, knee_t, ankle_t, foot_t):
+                cv2.circle(frame, p, 7, self.COLORS['yellow'], -1, lineType=self.linetype)
+
         # Track per-rep min/max hip angle once s2 has started
-        if 's2' in self.state_tracker['state_seq']:
+        if self.state_tracker['phase'] != IDLE:
             ang = int(hip_vertical)
             if self.state_tracker['rep_min_angle'] is None:
                 self.state_tracker['rep_min_angle'] = ang
@@ -311,9 +441,9 @@ class ProcessFrame:
         TARGET_HOLD = 5.0  # seconds
         if current_state == 's3':
             if self.state_tracker['s3_enter_time'] is None:
-                self.state_tracker['s3_enter_time'] = time.perf_counter()
+                self.state_tracker['s3_enter_time'] = now
             else:
-                if (time.perf_counter() - self.state_tracker['s3_enter_time']) >= TARGET_HOLD:
+                if (now - self.state_tracker['s3_enter_time']) >= TARGET_HOLD:
                     self.state_tracker['s3_hold_ok'] = True
         else:
             # If we left s3, keep the flag but clear entry time
@@ -322,10 +452,8 @@ class ProcessFrame:
         # --------- SUPPRESS form cues while in s3 (timer running) ---------
         if current_state == 's3':
             # Turn off "LOCK YOUR KNEE" and "DON'T ARCH YOUR BACK" and reset their TTLs
-            self.state_tracker['DISPLAY_TEXT'][0] = False
-            self.state_tracker['COUNT_FRAMES'][0] = 0
-            self.state_tracker['DISPLAY_TEXT'][1] = False
-            self.state_tracker['COUNT_FRAMES'][1] = 0
+            self._clear_bit(0)
+            self._clear_bit(1)
 
         # ---------------------- Counting & Feedback ---------------------- #
         play_sound = None
@@ -334,16 +462,16 @@ class ProcessFrame:
         if current_state == 's1':
             # Detect a "drop" from s3 straight to s1 (missed s2 on the way down)
             if self.state_tracker['prev_state'] == 's3':
-                self.state_tracker['DISPLAY_TEXT'][3] = True
+                self._set_bit(3)
                 self.state_tracker['INCORRECT_POSTURE'] = True
 
-            seq = self.state_tracker['state_seq']
-            have_full_seq = (len(seq) == 3 and seq == ['s2', 's3', 's2'])
+            phase = self.state_tracker['phase']
+            have_full_seq = phase == LOWERING
 
             # Range requirement
             range_ok = False
             if self.state_tracker['rep_min_angle'] is not None and self.state_tracker['rep_max_angle'] is not None:
-                if (self.state_tracker['rep_max_angle'] - self.state_tracker['rep_min_angle']) >= self.thresholds['REP_MIN_RANGE']:
+                if (self.state_tracker['rep_max_angle'] - self.state_tracker['rep_min_angle']) >= self._rep_min_range:
                     range_ok = True
 
             if have_full_seq and not self.state_tracker['INCORRECT_POSTURE'] and \
@@ -354,44 +482,42 @@ class ProcessFrame:
             else:
                 # INCORRECT (partial sequence, bad form, no hold, or too small range)
                 # If we only saw s2 and never reached s3, show "RAISE HIGHER"
-                if 's2' in seq and 's3' not in seq:
-                    self.state_tracker['DISPLAY_TEXT'][2] = True
+                if phase == RAISING:
+                    self._set_bit(2)
                 self.state_tracker['INCORRECT_COUNT'] += 1
                 play_sound = 'incorrect'
 
             # Reset per-rep state
-            self.state_tracker['state_seq'] = []
+            self.state_tracker['phase'] = IDLE
             self._reset_live_flags()
 
         else:
             # Live feedback while moving / at top
             # Do NOT set knee/torso cues while in s3 (timer phase)
-            if current_state != 's3' and knee_flexion > self.thresholds['KNEE_LOCK_MAX']:
-                self.state_tracker['DISPLAY_TEXT'][0] = True
+            if current_state != 's3' and knee_flexion > self._knee_lock_max:
+                self._set_bit(0)
                 self.state_tracker['INCORRECT_POSTURE'] = True
 
-            if current_state != 's3' and torso_tilt > self.thresholds['TORSO_TILT_MAX']:
-                self.state_tracker['DISPLAY_TEXT'][1] = True
+            if current_state != 's3' and torso_tilt > self._torso_tilt_max:
+                self._set_bit(1)
                 self.state_tracker['INCORRECT_POSTURE'] = True
 
             # If we're in s2 and clearly below PASS band, nudge "RAISE HIGHER"
-            pass_lo = self.thresholds['HIP_KNEE_VERT']['PASS'][0]
-            if current_state == 's2' and hip_vertical < pass_lo:
-                self.state_tracker['DISPLAY_TEXT'][2] = True
+            if current_state == 's2' and hip_vertical < self._p_lo:
+                self._set_bit(2)
 
         # ---------------------- Inactivity (side-view) ---------------------- #
         display_inactivity = False
         if self.state_tracker['curr_state'] == self.state_tracker['prev_state']:
-            end_time = time.perf_counter()
-            self.state_tracker['INACTIVE_TIME'] += end_time - self.state_tracker['start_inactive_time']
-            self.state_tracker['start_inactive_time'] = end_time
+            self.state_tracker['INACTIVE_TIME'] += now - self.state_tracker['start_inactive_time']
+            self.state_tracker['start_inactive_time'] = now
 
-            if self.state_tracker['INACTIVE_TIME'] >= self.thresholds['INACTIVE_THRESH']:
+            if self.state_tracker['INACTIVE_TIME'] >= self._inactive_thresh:
                 play_sound = 'reset_counters'
                 self._hard_reset_all()
                 display_inactivity = True
         else:
-            self.state_tracker['start_inactive_time'] = time.perf_counter()
+            self.state_tracker['start_inactive_time'] = now
             self.state_tracker['INACTIVE_TIME'] = 0.0
 
         # ---------------------- Overlay ---------------------- #
@@ -401,16 +527,16 @@ class ProcessFrame:
 
         # Numeric overlays
         # Hip flex (state driver)
-        cv2.putText(frame, str(int(hip_vertical)), (int(hip[0] + 10 if not self.flip_frame else frame_width - hip[0] + 10), hip[1]),
+        cv2.putText(frame, str(int(hip_vertical)), (hip_t[0] + 10 if not self.flip_frame else frame_width - hip_t[0] + 10, hip_t[1]),
                     self.font, 0.6, self.COLORS['light_green'], 2, lineType=self.linetype)
 
         # Knee flexion (as degrees of bend)
-        cv2.putText(frame, str(int(knee_flexion)), (int(knee[0] + 15 if not self.flip_frame else frame_width - knee[0] + 15), knee[1] + 10),
+        cv2.putText(frame, str(int(knee_flexion)), (knee_t[0] + 15 if not self.flip_frame else frame_width - knee_t[0] + 15, knee_t[1] + 10),
                     self.font, 0.6, self.COLORS['light_green'], 2, lineType=self.linetype)
 
         # Show hold timer while in s3 (counts up to 5 s)
         if self.state_tracker['curr_state'] == 's3' and self.state_tracker['s3_enter_time'] is not None:
-            held_for = time.perf_counter() - self.state_tracker['s3_enter_time']
+            held_for = now - self.state_tracker['s3_enter_time']
             if held_for > 5.0:
                 held_for = 5.0
             draw_text(
@@ -425,14 +551,18 @@ class ProcessFrame:
 
 
         # Feedback banners (with per-label lifetime)
-        self.state_tracker['COUNT_FRAMES'][self.state_tracker['DISPLAY_TEXT']] += 1
-        frame = self._show_feedback(frame, self.state_tracker['COUNT_FRAMES'], self.FEEDBACK_ID_MAP)
+        mask = self.state_tracker['DISPLAY_TEXT']
+        counts = self.state_tracker['COUNT_FRAMES']
+        for idx in range(4):
+            if mask & (1 << idx):
+                counts[idx] += 1
+        frame = self._show_feedback(frame, mask, self.FEEDBACK_ID_MAP)
 
         # TTL for banners
-        ttl = self.thresholds['CNT_FRAME_THRESH']
-        mask = self.state_tracker['COUNT_FRAMES'] > ttl
-        self.state_tracker['DISPLAY_TEXT'][mask] = False
-        self.state_tracker['COUNT_FRAMES'][mask] = 0
+        ttl = self._cnt_frame_thresh
+        for idx in range(4):
+            if counts[idx] > ttl:
+                self._clear_bit(idx)
 
         # Commit prev_state
         self.state_tracker['prev_state'] = current_state
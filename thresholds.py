@@ -75,6 +75,10 @@ def get_thresholds_leg_raises_beginner():
         'INACTIVE_THRESH' : 15.0,
 
         'CNT_FRAME_THRESH': 50,
+
+        'POSE_SKIP'       : 2,    # run pose detection every N frames
+        'POSE_SCALE'      : 0.5,  # downscale factor for the pose model input
+        'IDLE_SKIP_DRAW'  : 30,   # frames resting in s1 before the skeleton stops being drawn
     }
     return thresholds
 
@@ -100,5 +104,9 @@ def get_thresholds_leg_raises_pro():
         'INACTIVE_THRESH' : 15.0,
 
         'CNT_FRAME_THRESH': 50,
+
+        'POSE_SKIP'       : 2,    # run pose detection every N frames
+        'POSE_SCALE'      : 0.5,  # downscale factor for the pose model input
+        'IDLE_SKIP_DRAW'  : 30,   # frames resting in s1 before the skeleton stops being drawn
     }
     return thresholds
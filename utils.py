@@ -1,3 +1,8 @@
+import math
+import queue
+import threading
+from functools import lru_cache
+
 import cv2
 import mediapipe as mp
 import numpy as np
@@ -34,11 +39,24 @@ def draw_rounded_rect(img, rect_start, rect_end, corner_width, box_color):
 
 
 
+@lru_cache(maxsize=16)
+def _dot_offsets(span, step=8):
+    # (n, 2, 2) offsets: each dot is a zero-length segment at (0, y)
+    ys = np.arange(0, span + 1, step, dtype=np.int32)
+    offsets = np.zeros((len(ys), 2, 2), dtype=np.int32)
+    offsets[:, :, 1] = ys[:, None]
+    offsets.flags.writeable = False   # cached and shared by every caller
+    return offsets
+
+
 def draw_dotted_line(frame, lm_coord, start, end, line_color):
-    pix_step = 0
+    offsets = _dot_offsets(int(end - start))
+    if not len(offsets):
+        return frame
 
-    for i in range(start, end+1, 8):
-        cv2.circle(frame, (lm_coord[0], i+pix_step), 2, line_color, -1, lineType=cv2.LINE_AA)
+    # One polylines call for all dots; thickness 4 renders each as the old radius-2 dot
+    dots = offsets + np.array([lm_coord[0], start], dtype=np.int32)
+    cv2.polylines(frame, list(dots), False, line_color, 4, lineType=cv2.LINE_AA)
 
     return frame
 
@@ -84,13 +102,14 @@ def draw_text(
 
 
 def find_angle(p1, p2, ref_pt = np.array([0,0])):
-    p1_ref = p1 - ref_pt
-    p2_ref = p2 - ref_pt
+    # atan2(|cross|, dot): no sqrt/division, stable near 0 and 180 degrees
+    v1x, v1y = float(p1[0] - ref_pt[0]), float(p1[1] - ref_pt[1])
+    v2x, v2y = float(p2[0] - ref_pt[0]), float(p2[1] - ref_pt[1])
 
-    cos_theta = (np.dot(p1_ref,p2_ref)) / (1.0 * np.linalg.norm(p1_ref) * np.linalg.norm(p2_ref))
-    theta = np.arccos(np.clip(cos_theta, -1.0, 1.0))
-            
-    degree = int(180 / np.pi) * theta
+    cross = v1x * v2y - v1y * v2x
+    dot = v1x * v2x + v1y * v2y
+
+    degree = math.degrees(math.atan2(abs(cross), dot))
 
     return int(degree)
 
@@ -143,4 +162,152 @@ def get_mediapipe_pose(
                                     min_detection_confidence = min_detection_confidence,
                                     min_tracking_confidence = min_tracking_confidence
                                  )
-    return pose
\ No newline at end of file
+    return pose
+
+
+
+def resize_for_pose(frame, scale, min_side=256):
+    """
+    Downscale a frame before pose.process to cut the image copy into MediaPipe.
+    Landmarks come back normalised, so no rescaling is needed afterwards.
+    The short side is kept at >= min_side (the pose model's input size).
+    """
+    scale = max(scale, min_side / min(frame.shape[:2]))
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+
+
+class OneEuroFilter:
+    """
+    One Euro low-pass filter (Casiez et al., CHI 2012) applied element-wise
+    to an array of pixel coordinates. Call with (values, timestamp_seconds).
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = None
+        self._t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        x = np.array(x, dtype=np.float32)   # copy: callers may pass a reused buffer
+        if self._x is None:
+            self._x, self._dx, self._t = x, np.zeros_like(x), t
+            return x
+
+        dt = max(t - self._t, 1e-6)
+        self._t = t
+
+        a_d = self._alpha(self.d_cutoff, dt)
+        self._dx = a_d * (x - self._x) / dt + (1 - a_d) * self._dx
+
+        a = self._alpha(self.min_cutoff + self.beta * np.abs(self._dx), dt)
+        self._x = a * x + (1 - a) * self._x
+        return self._x
+
+
+
+
+class PoseWorker:
+    """
+    Runs pose.process on a background thread so inference on the next frame
+    overlaps with state logic and drawing on the current one.
+    Frames go in with submit(); get() returns (frame, pose_landmarks) in the
+    same order. If pose.process raises, get() re-raises it and later frames are
+    dropped. close() sends a stop sentinel and joins the thread.
+    """
+
+    _STOP = object()
+
+    def __init__(self, pose, maxsize=2, scale=1.0):
+        self.pose = pose
+        self.scale = scale
+        self._in = queue.Queue(maxsize=maxsize)
+        self._out = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        failed = False
+        while True:
+            frame = self._in.get()
+            if frame is self._STOP:
+                break
+            if failed:
+                continue    # keep draining so submit()/close() never block
+            try:
+                keypoints = self.pose.process(resize_for_pose(frame, self.scale))
+            except Exception as e:
+                failed = True
+                self._out.put(e)
+                continue
+            self._out.put((frame, keypoints.pose_landmarks))
+
+    def submit(self, frame):
+        self._in.put(frame)
+
+    def get(self):
+        item = self._out.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        self._in.put(self._STOP)
+        self._thread.join()
+
+
+
+
+class FrameWriter:
+    """
+    Drop-in for cv2.VideoWriter's write()/release() that encodes on a
+    background thread, so writing the output video overlaps with processing
+    the next frame. write() blocks when the queue is full instead of dropping:
+    every frame belongs in the file. An error from the underlying write() is
+    re-raised by release(), after the file has been closed.
+    """
+
+    _STOP = object()
+
+    def __init__(self, video_writer, maxsize=4):
+        self.video_writer = video_writer
+        self._error = None
+        self._in = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._in.get()
+            if frame is self._STOP:
+                break
+            if self._error is not None:
+                continue    # keep draining so write()/release() never block
+            try:
+                self.video_writer.write(frame)
+            except Exception as e:
+                self._error = e
+
+    def write(self, frame):
+        self._in.put(frame)
+
+    def release(self):
+        self._in.put(self._STOP)
+        self._thread.join()
+        self.video_writer.release()
+        if self._error is not None:
+            raise self._error